@@ -0,0 +1,32 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
+
+# prefer the libyaml C bindings when PyYAML was built with them
+_Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@lru_cache(maxsize=None)
+def _load_yaml_file(path_str, mtime_ns):
+    return yaml.load(Path(path_str).read_bytes(), Loader=_Loader)
+
+
+def load_yaml_file(path):
+    """
+    Load and parse a YAML file, caching the parsed data.
+
+    The cache is keyed on the path and its modification time, so a file
+    rewritten on disk is parsed again while repeated loads of the same
+    revision are served from memory. Callers which modify the returned
+    data must write it back to disk so the stale cache entry is never
+    served again.
+
+    :param path: The path to the YAML file
+    :returns: The parsed data
+    """
+    path = Path(path)
+    return _load_yaml_file(str(path), path.stat().st_mtime_ns)
@@ -0,0 +1,219 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import os
+from pathlib import Path
+import traceback
+from urllib.parse import urljoin
+from urllib.request import pathname2url
+
+from colcon_core.logging import colcon_logger
+from colcon_core.plugin_system import instantiate_extensions
+from colcon_core.plugin_system import order_extensions_by_priority
+from ros_buildfarm.config import load_url
+import yaml
+
+logger = colcon_logger.getChild(__name__)
+
+# prefer the libyaml C bindings when PyYAML was built with them
+_Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_Dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+class ConfigAugmentationExtensionPoint:
+    """
+    The interface for config augmentation extensions.
+
+    A config augmentation extension modifies a local copy of a ros_buildfarm
+    configuration index before it is used to perform any builds.
+
+    For each instance the attribute `CONFIG_AUGMENTATION_NAME` is being set
+    to the basename of the entry point registering the extension.
+    """
+
+    """The version of the config augmentation extension interface."""
+    EXTENSION_POINT_VERSION = '1.1'
+
+    """The default priority of config augmentation extensions."""
+    PRIORITY = 100
+
+    def add_arguments(self, *, parser):
+        """
+        Add command line arguments specific to the config augmentation.
+
+        The method is intended to be overridden in a subclass.
+
+        :param parser: The argument parser
+        """
+        pass
+
+    def augment_config(self, config_path, args, *, index_data=None):
+        """
+        Augment the local ros_buildfarm configuration.
+
+        The method must be overridden in a subclass.
+
+        :param config_path: The path to the directory containing the local
+          configuration index
+        :param args: The parsed command line arguments
+        :param index_data: The parsed configuration index, if already
+          available, so extensions do not need to re-read it from disk
+        """
+        raise NotImplementedError()
+
+
+@lru_cache(maxsize=None)
+def _get_extensions(group_name):
+    extensions = instantiate_extensions(group_name)
+    for name, extension in extensions.items():
+        extension.CONFIG_AUGMENTATION_NAME = name
+    return order_extensions_by_priority(extensions)
+
+
+def get_config_augmentation_extensions(*, group_name=None):
+    """
+    Get the available config augmentation extensions.
+
+    The extensions are ordered by their priority and entry point name.
+    The result is cached so that repeated calls within one invocation do
+    not re-scan the installed entry points.
+
+    :rtype: OrderedDict
+    """
+    if group_name is None:
+        group_name = __name__
+    return _get_extensions(group_name)
+
+
+def add_config_augmentation_arguments(parser, *, extensions=None):
+    """
+    Add the command line arguments for the config augmentation extensions.
+
+    :param parser: The argument parser
+    """
+    if extensions is None:
+        extensions = get_config_augmentation_extensions()
+    for name, extension in extensions.items():
+        group = parser.add_argument_group(
+            title=f"Arguments for '{name}' config augmentation")
+        try:
+            retval = extension.add_arguments(parser=group)
+            assert retval is None, 'add_arguments() should return None'
+        except Exception as e:  # noqa: F841
+            # catch exceptions raised in config augmentation extension
+            exc = traceback.format_exc()
+            logger.error(
+                'Exception in config augmentation extension '
+                f"'{name}': {e}\n{exc}")
+            # skip failing extension, continue with next one
+
+
+def augment_config(
+    config_path, args, *, augmentation_extensions=None, index_data=None
+):
+    """
+    Augment the local ros_buildfarm configuration.
+
+    :param config_path: The path to the directory containing the local
+      configuration index
+    :param args: The parsed command line arguments
+    :param index_data: The parsed configuration index, if already available
+    """
+    if augmentation_extensions is None:
+        augmentation_extensions = get_config_augmentation_extensions()
+
+    for extension in augmentation_extensions.values():
+        try:
+            retval = extension.augment_config(
+                config_path, args, index_data=index_data)
+            assert retval is None, 'augment_config() should return None'
+        except Exception as e:  # noqa: F841
+            # catch exceptions raised in config augmentation extension
+            exc = traceback.format_exc()
+            logger.error(
+                'Exception in config augmentation extension '
+                f"'{extension.CONFIG_AUGMENTATION_NAME}': {e}\n{exc}")
+            # skip failing extension, continue with next one
+
+
+def _load_yaml(url):
+    """
+    Load a ros_buildfarm configuration file.
+
+    Unlike `ros_buildfarm.config.load_yaml`, the YAML payload is parsed
+    using the libyaml C bindings when they are available.
+
+    :param url: The URL of the configuration file
+    :returns: The parsed configuration data
+    """
+    # resolve relative file paths from CWD
+    url = urljoin('file://' + pathname2url(os.getcwd()) + '/', url)
+
+    class _BuildfarmConfigSafeLoader(_Loader):
+
+        def include(self, node):
+            include_url = self.relative_url(node)
+            return _load_yaml(include_url)
+
+        def relative_url(self, node):
+            return urljoin(url, self.construct_scalar(node))
+
+    _BuildfarmConfigSafeLoader.add_constructor(
+        '!include', _BuildfarmConfigSafeLoader.include)
+    _BuildfarmConfigSafeLoader.add_constructor(
+        '!relative_url', _BuildfarmConfigSafeLoader.relative_url)
+
+    yaml_str = load_url(url)
+    return yaml.load(yaml_str, _BuildfarmConfigSafeLoader)
+
+
+def get_config(args, config_base):
+    """
+    Create an augmented copy of a ros_buildfarm configuration.
+
+    The upstream configuration index and the release build files it
+    references are fetched and written to the given directory, then each
+    config augmentation extension is invoked on the local copy.
+
+    :param args: The parsed command line arguments
+    :param config_base: The base path to write the local configuration to
+    :returns: The URL of the local configuration index
+    :rtype: str
+    """
+    # resolve the path up front so the index URI can be derived from it
+    # even when a relative path was passed in
+    config_path = Path(config_base).resolve()
+    config_path.mkdir(parents=True, exist_ok=True)
+
+    index_data = _load_yaml(args.upstream_config_url)
+    dist_data = index_data.get(
+        'distributions', {}).get(args.ros_distro, {})
+    release_builds = dist_data.get('release_builds', {})
+    if release_builds:
+        # each build file is an independent HTTPS round-trip, so fetch
+        # them concurrently instead of paying the latency per file
+        build_file_urls = [
+            urljoin(args.upstream_config_url, build_file_url)
+            for build_file_url in release_builds.values()]
+        with ThreadPoolExecutor(
+            max_workers=min(8, len(build_file_urls))
+        ) as executor:
+            fetched = executor.map(_load_yaml, build_file_urls)
+        for build_name, build_file_data in zip(release_builds, fetched):
+            build_file_name = f'{args.ros_distro}-release-{build_name}.yaml'
+            with (config_path / build_file_name).open('w') as f:
+                yaml.dump(build_file_data, f, Dumper=_Dumper)
+            release_builds[build_name] = build_file_name
+
+    # hand the parsed index to the augmentation extensions and only
+    # serialize it once at the end, instead of dumping it here just for
+    # the extensions to parse it back from disk
+    augment_config(config_path, args, index_data=index_data)
+
+    index_path = config_path / 'index.yaml'
+    with index_path.open('w') as f:
+        yaml.dump(index_data, f, Dumper=_Dumper)
+
+    return index_path.as_uri()
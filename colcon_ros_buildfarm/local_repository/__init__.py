@@ -0,0 +1,116 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from functools import lru_cache
+
+from colcon_core.logging import colcon_logger
+from colcon_core.plugin_system import instantiate_extensions
+from colcon_core.plugin_system import order_extensions_by_priority
+from ros_buildfarm.common import package_format_mapping
+
+logger = colcon_logger.getChild(__name__)
+
+
+class LocalRepositoryExtensionPoint:
+    """
+    The interface for local repository extensions.
+
+    A local repository extension maintains an on-disk package repository
+    for a specific package format.
+
+    For each instance the attribute `LOCAL_REPOSITORY_NAME` is being set
+    to the basename of the entry point registering the extension.
+    """
+
+    """The version of the local repository extension interface."""
+    EXTENSION_POINT_VERSION = '1.0'
+
+    """The default priority of local repository extensions."""
+    PRIORITY = 100
+
+    """The package format handled by this extension."""
+    PACKAGE_FORMAT = None
+
+    def initialize(self, repo_base, os_name, os_code_name, arch):
+        """
+        Initialize an empty repository for a specific platform.
+
+        The method must be overridden in a subclass.
+
+        :param repo_base: The base path of the local repositories
+        :param os_name: The OS name of the target platform
+        :param os_code_name: The OS code name of the target platform
+        :param arch: The architecture of the target platform
+        """
+        raise NotImplementedError()
+
+    async def import_source(
+        self, repo_base, os_name, os_code_name, artifact_path
+    ):
+        """
+        Import a source package artifact into the repository.
+
+        The method must be overridden in a subclass.
+
+        :param repo_base: The base path of the local repositories
+        :param os_name: The OS name of the target platform
+        :param os_code_name: The OS code name of the target platform
+        :param artifact_path: The path to the built artifacts
+        """
+        raise NotImplementedError()
+
+    async def import_binary(
+        self, repo_base, os_name, os_code_name, arch, artifact_path
+    ):
+        """
+        Import a binary package artifact into the repository.
+
+        The method must be overridden in a subclass.
+
+        :param repo_base: The base path of the local repositories
+        :param os_name: The OS name of the target platform
+        :param os_code_name: The OS code name of the target platform
+        :param arch: The architecture of the target platform
+        :param artifact_path: The path to the built artifacts
+        """
+        raise NotImplementedError()
+
+
+@lru_cache(maxsize=None)
+def _get_extensions(group_name):
+    extensions = instantiate_extensions(group_name)
+    for name, extension in extensions.items():
+        extension.LOCAL_REPOSITORY_NAME = name
+    return order_extensions_by_priority(extensions)
+
+
+def get_local_repository_extensions(*, group_name=None):
+    """
+    Get the available local repository extensions.
+
+    The extensions are ordered by their priority and entry point name.
+    The result is cached so that repeated calls within one invocation do
+    not re-scan the installed entry points.
+
+    :rtype: OrderedDict
+    """
+    if group_name is None:
+        group_name = __name__
+    return _get_extensions(group_name)
+
+
+def select_local_repository_extension(os_name, *, extensions=None):
+    """
+    Select the local repository extension handling an OS' package format.
+
+    :param os_name: The OS name of the target platform
+    :returns: The local repository extension or None if the package format
+      of the OS is not supported
+    """
+    if extensions is None:
+        extensions = get_local_repository_extensions()
+    package_format = package_format_mapping.get(os_name)
+    for extension in extensions.values():
+        if extension.PACKAGE_FORMAT == package_format:
+            return extension
+    return None
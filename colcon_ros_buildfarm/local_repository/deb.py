@@ -0,0 +1,314 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from asyncio import Lock
+import fcntl
+import gzip
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import time
+
+from colcon_core.logging import colcon_logger
+from colcon_core.plugin_system import satisfies_version
+from colcon_core.subprocess import run
+from colcon_ros_buildfarm.local_repository \
+    import LocalRepositoryExtensionPoint
+
+try:
+    # ISA-L deflate is several times faster than zlib at comparable ratios
+    from isal import igzip as _gzip
+    _GZ_COMPRESSLEVEL = 3
+except ImportError:
+    _gzip = gzip
+    # apt clients decompress any level at the same speed, so favor
+    # compression speed over the gzip default of 9
+    _GZ_COMPRESSLEVEL = 6
+
+logger = colcon_logger.getChild(__name__)
+
+# large chunks keep each digest update inside OpenSSL's C inner loop,
+# which amortizes the per-call overhead and lets hardware-accelerated
+# SHA implementations approach memory bandwidth
+_READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+# linux ioctl requesting a copy-on-write clone of an entire file
+_FICLONE = 0x40049409
+
+
+def _file_digest(path):
+    """
+    Compute a content digest of a file.
+
+    :param path: The path to the file
+    :rtype: bytes
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    buf = bytearray(_READ_CHUNK_SIZE)
+    view = memoryview(buf)
+    with open(path, 'rb') as f:
+        while True:
+            count = f.readinto(buf)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.digest()
+
+
+def _clone_or_copy(src, dst):
+    """
+    Copy a file, preferring in-kernel data paths.
+
+    A reflink clone is attempted first, which is nearly free on
+    filesystems supporting copy-on-write sharing. Next the data is
+    copied with os.copy_file_range, which stays in the kernel, before
+    falling back to a userspace copy. Metadata is preserved in all
+    cases.
+
+    :param src: The path to the source file
+    :param dst: The path to the destination file
+    """
+    with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), _FICLONE, f_src.fileno())
+        except OSError:
+            try:
+                remaining = os.fstat(f_src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(
+                        f_src.fileno(), f_dst.fileno(), remaining)
+                    if not copied:
+                        break
+                    remaining -= copied
+            except (AttributeError, OSError):
+                f_src.seek(0)
+                f_dst.seek(0)
+                f_dst.truncate()
+                shutil.copyfileobj(f_src, f_dst, _READ_CHUNK_SIZE)
+    shutil.copystat(src, dst)
+
+
+class _RawAndGzFiles:
+    """Write-only file-like object which also writes a compressed copy."""
+
+    # deflate performs much better on large blocks than on the
+    # line-sized writes produced by the subprocess stdout callback
+    _FLUSH_THRESHOLD = 256 * 1024
+
+    def __init__(self, path):
+        self._path = path
+
+    def __enter__(self):
+        self._raw = self._path.open('wb', buffering=_READ_CHUNK_SIZE)
+        self._com = _gzip.open(
+            str(self._path) + '.gz', 'wb',
+            compresslevel=_GZ_COMPRESSLEVEL)
+        self._buf = bytearray()
+        return self
+
+    def write(self, data):
+        self._raw.write(data)
+        self._buf += data
+        if len(self._buf) >= self._FLUSH_THRESHOLD:
+            self._com.write(self._buf)
+            self._buf.clear()
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        if self._buf:
+            self._com.write(self._buf)
+            self._buf.clear()
+        self._com.close()
+        self._raw.close()
+
+
+class LocalDebRepositoryExtension(LocalRepositoryExtensionPoint):
+    """Maintain a local repository of Debian packages."""
+
+    PACKAGE_FORMAT = 'deb'
+
+    def __init__(self):  # noqa: D107
+        super().__init__()
+        satisfies_version(
+            LocalRepositoryExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+        # pool mutations, metadata scans and Release generation are
+        # guarded separately so that scans for different architectures
+        # of the same OS can run concurrently; locks are created lazily
+        # in the running event loop, only for keys actually imported to
+        self._pool_lock = {}
+        self._md_lock = {}
+        self._release_lock = {}
+
+    def initialize(  # noqa: D102
+        self, repo_base, os_name, os_code_name, arch
+    ):
+        os_dir = Path(repo_base) / os_name
+        dist_dir = os_dir / 'dists' / os_code_name
+
+        source_dir = dist_dir / 'main' / 'source'
+        source_dir.mkdir(parents=True, exist_ok=True)
+        src_md_file = source_dir / 'Sources'
+        if not src_md_file.exists():
+            src_md_file.touch()
+        src_md_gz_file = source_dir / 'Sources.gz'
+        if not src_md_gz_file.exists():
+            with src_md_file.open('rb') as f_in:
+                with _gzip.open(
+                    src_md_gz_file, 'wb', compresslevel=_GZ_COMPRESSLEVEL,
+                ) as f_out:
+                    shutil.copyfileobj(f_in, f_out, _READ_CHUNK_SIZE)
+
+        arch_dir = dist_dir / 'main' / f'binary-{arch}'
+        arch_dir.mkdir(parents=True, exist_ok=True)
+        arch_md_file = arch_dir / 'Packages'
+        if not arch_md_file.exists():
+            arch_md_file.touch()
+        arch_md_gz_file = arch_dir / 'Packages.gz'
+        if not arch_md_gz_file.exists():
+            with arch_md_file.open('rb') as f_in:
+                with _gzip.open(
+                    arch_md_gz_file, 'wb', compresslevel=_GZ_COMPRESSLEVEL,
+                ) as f_out:
+                    shutil.copyfileobj(f_in, f_out, _READ_CHUNK_SIZE)
+
+        (os_dir / 'pool').mkdir(parents=True, exist_ok=True)
+
+        self._generate_release(dist_dir, os_code_name)
+
+    async def import_source(  # noqa: D102
+        self, repo_base, os_name, os_code_name, artifact_path
+    ):
+        os_dir = Path(repo_base) / os_name
+        async with self._pool_lock.setdefault(os_dir, Lock()):
+            pool_dir = os_dir / 'pool'
+            # classify the artifacts in a single directory scan instead
+            # of matching a glob pattern per file type
+            with os.scandir(artifact_path / 'sourcedeb') as entries:
+                for entry in entries:
+                    if entry.name.endswith(
+                        ('.dsc', '.orig.tar.gz', '.debian.tar.xz')
+                    ):
+                        self._copy_to_pool(pool_dir, Path(entry.path))
+        await self._update_metadata(os_dir, os_code_name, None)
+
+    async def import_binary(  # noqa: D102
+        self, repo_base, os_name, os_code_name, arch, artifact_path
+    ):
+        os_dir = Path(repo_base) / os_name
+        async with self._pool_lock.setdefault(os_dir, Lock()):
+            pool_dir = os_dir / 'pool'
+            for path in (artifact_path / 'binarydeb').glob('*.deb'):
+                self._copy_to_pool(pool_dir, path)
+        await self._update_metadata(os_dir, os_code_name, arch)
+
+    def _copy_to_pool(self, pool_dir, path):
+        # plain string joins avoid allocating a chain of PurePath
+        # objects per imported artifact
+        name = path.name
+        subdir = os.path.join(str(pool_dir), name[0])
+        os.makedirs(subdir, exist_ok=True)
+        dst = os.path.join(subdir, name)
+        try:
+            # re-runs typically import the identical artifacts again, so
+            # skip files which are already present in the pool; matching
+            # sizes alone are not proof of identity, so the content
+            # hashes decide in that case
+            if os.stat(dst).st_size == path.stat().st_size and \
+                    _file_digest(dst) == _file_digest(path):
+                return
+        except FileNotFoundError:
+            pass
+        try:
+            # mirror the RPM extension and hardlink when the artifact
+            # and the pool are on the same filesystem; the pool is only
+            # ever read from, so sharing the inode is safe
+            os.link(path, dst)
+        except OSError:
+            _clone_or_copy(str(path), dst)
+
+    async def _update_metadata(self, os_dir, os_code_name, arch):
+        dist_dir = os_dir / 'dists' / os_code_name
+        if arch is not None:
+            md_path = dist_dir / 'main' / f'binary-{arch}' / 'Packages'
+            cmd = ['dpkg-scanpackages', '--arch', arch, 'pool']
+        else:
+            md_path = dist_dir / 'main' / 'source' / 'Sources'
+            cmd = ['dpkg-scansources', 'pool']
+        async with self._md_lock.setdefault(md_path, Lock()):
+            with _RawAndGzFiles(md_path) as md:
+                res = await run(cmd, md.write, None, cwd=str(os_dir))
+            if res.returncode:
+                raise RuntimeError(
+                    f"Failed to enumerate packages with '{cmd[0]}' "
+                    f'(rc {res.returncode})')
+        async with self._release_lock.setdefault(os_dir, Lock()):
+            self._generate_release(dist_dir, os_code_name)
+
+    def _generate_release(self, dist_dir, os_code_name):
+        # a single scandir walk of main/ discovers the metadata files as
+        # well as their sizes, which DirEntry.stat caches from readdir,
+        # instead of a stat syscall per glob match plus one per file
+        package_files = []
+        archs = []
+        with os.scandir(os.path.join(str(dist_dir), 'main')) as subdirs:
+            for subdir in subdirs:
+                if not subdir.is_dir():
+                    continue
+                if subdir.name.startswith('binary-'):
+                    archs.append(subdir.name[len('binary-'):])
+                    prefix = 'Packages'
+                elif subdir.name == 'source':
+                    prefix = 'Sources'
+                else:
+                    continue
+                with os.scandir(subdir.path) as entries:
+                    package_files.extend(
+                        (entry.path, entry.stat().st_size)
+                        for entry in entries
+                        if entry.name.startswith(prefix))
+        package_files.sort()
+        archs.sort()
+
+        # hash each metadata file once, updating all digests in a single
+        # streamed pass instead of reading the file per digest type
+        md5s = []
+        sha1s = []
+        sha256s = []
+        buf = bytearray(_READ_CHUNK_SIZE)
+        # slicing each path string against the precomputed prefix length
+        # replaces a PurePath allocation per metadata file
+        rel_start = len(str(dist_dir)) + 1
+        for package_file, size in package_files:
+            md5 = hashlib.md5()
+            sha1 = hashlib.sha1()
+            sha256 = hashlib.sha256()
+            with open(package_file, 'rb') as f:
+                view = memoryview(buf)
+                while True:
+                    count = f.readinto(buf)
+                    if not count:
+                        break
+                    md5.update(view[:count])
+                    sha1.update(view[:count])
+                    sha256.update(view[:count])
+            rel_path = package_file[rel_start:]
+            md5s.append((md5.hexdigest(), size, rel_path))
+            sha1s.append((sha1.hexdigest(), size, rel_path))
+            sha256s.append((sha256.hexdigest(), size, rel_path))
+
+        with (dist_dir / 'Release').open('w') as f:
+            f.write('Origin: colcon-ros-buildfarm\n')
+            f.write('Label: colcon-ros-buildfarm\n')
+            f.write(f'Suite: {os_code_name}\n')
+            f.write(f'Codename: {os_code_name}\n')
+            f.write('Date: {}\n'.format(
+                time.strftime('%a, %d %b %Y %H:%M:%S UTC', time.gmtime())))
+            f.write('Architectures: {}\n'.format(' '.join(archs)))
+            f.write('Components: main\n')
+            for section, digests in (
+                ('MD5Sum', md5s), ('SHA1', sha1s), ('SHA256', sha256s),
+            ):
+                f.write(f'{section}:\n')
+                for digest, size, rel_path in digests:
+                    f.write(f' {digest} {size} {rel_path}\n')
@@ -0,0 +1,205 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from asyncio import Lock
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from colcon_core.logging import colcon_logger
+from colcon_core.plugin_system import satisfies_version
+from colcon_ros_buildfarm.local_repository \
+    import LocalRepositoryExtensionPoint
+
+try:
+    import createrepo_c
+except ImportError:
+    createrepo_c = None
+
+logger = colcon_logger.getChild(__name__)
+
+_CREATEREPO_SNIPPET = 'import createrepo_c; createrepo_c.createrepo_c()'
+
+# some distributions ship createrepo_c Python bindings without the
+# command line entry point, so probe for the callable instead of only
+# checking that the module imports
+_CREATEREPO_IN_PROCESS = callable(
+    getattr(createrepo_c, 'createrepo_c', None))
+
+
+def _parse_rpm_name(file_name):
+    """
+    Split an RPM file name into its name, version, release and arch.
+
+    Splitting from the end of the string costs a fraction of the
+    previously used regular expression, which backtracked on every
+    non-matching name.
+
+    :param file_name: The RPM file name
+    :returns: A (name, version, release, arch) tuple, or None if the
+      file name does not follow the NVRA pattern
+    """
+    if not file_name.endswith('.rpm'):
+        return None
+    stem = file_name[:-4]
+    try:
+        rest, arch = stem.rsplit('.', 1)
+        rest, release = rest.rsplit('-', 1)
+        name, version = rest.rsplit('-', 1)
+    except ValueError:
+        return None
+    if not all(p.isdigit() for p in version.split('.')):
+        return None
+    if not release or not release[0].isdigit():
+        return None
+    return (name, version, release, arch)
+
+
+def _createrepo(repo_dir, *extra_args):
+    """
+    Generate repository metadata for a directory of RPM packages.
+
+    When the createrepo_c Python bindings expose the command line entry
+    point the command is run in-process, avoiding an interpreter spawn
+    plus full module import per invocation. Otherwise a separate
+    interpreter is spawned.
+
+    :param repo_dir: The path to the repository directory
+    :param extra_args: Additional createrepo_c command line arguments
+    :raises subprocess.CalledProcessError: if the metadata generation
+      fails
+    """
+    argv = ['createrepo_c', '--quiet', *extra_args, str(repo_dir)]
+    if _CREATEREPO_IN_PROCESS:
+        argv_orig = sys.argv
+        sys.argv = argv
+        try:
+            # the entry point may report its result either as a return
+            # value or by raising SystemExit, which must not escape and
+            # tear down the process
+            rc = createrepo_c.createrepo_c()
+        except SystemExit as e:  # noqa: F841
+            rc = e.code
+        finally:
+            sys.argv = argv_orig
+        if rc:
+            raise subprocess.CalledProcessError(
+                rc if isinstance(rc, int) else 1, argv)
+    else:
+        subprocess.check_call([
+            sys.executable, '-c', _CREATEREPO_SNIPPET, *argv[1:]])
+
+
+class LocalRpmRepositoryExtension(LocalRepositoryExtensionPoint):
+    """Maintain a local repository of RPM packages."""
+
+    PACKAGE_FORMAT = 'rpm'
+
+    def __init__(self):  # noqa: D107
+        super().__init__()
+        satisfies_version(
+            LocalRepositoryExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+        self._lock = {}
+        # per-repository {package name: [paths]} index, keyed by the
+        # modification time of the repository directory
+        self._name_index = {}
+        self._index_mtime = {}
+
+    def initialize(  # noqa: D102
+        self, repo_base, os_name, os_code_name, arch
+    ):
+        repo_dirs = self._get_repo_dirs(
+            repo_base, os_name, os_code_name, arch)
+        for repo_dir in repo_dirs:
+            repo_dir.mkdir(parents=True, exist_ok=True)
+        if _CREATEREPO_IN_PROCESS:
+            # the in-process invocation swaps sys.argv and is therefore
+            # not thread-safe, but it also has no interpreter startup
+            # cost worth hiding
+            for repo_dir in repo_dirs:
+                _createrepo(repo_dir)
+        else:
+            # seed the SRPM, arch and debug repositories concurrently
+            # so the three interpreter spawns overlap
+            with ThreadPoolExecutor(max_workers=len(repo_dirs)) as executor:
+                list(executor.map(_createrepo, repo_dirs))
+
+    async def import_source(  # noqa: D102
+        self, repo_base, os_name, os_code_name, artifact_path
+    ):
+        repo_dir = Path(repo_base) / os_name / os_code_name / 'SRPMS'
+        rpms = list((artifact_path / 'sourcepkg').glob('*.src.rpm'))
+        await self._import_to(repo_dir, rpms)
+
+    async def import_binary(  # noqa: D102
+        self, repo_base, os_name, os_code_name, arch, artifact_path
+    ):
+        os_dir = Path(repo_base) / os_name / os_code_name
+        rpms = []
+        debug_rpms = []
+        for rpm in (artifact_path / 'binarypkg').glob('*.rpm'):
+            parsed = _parse_rpm_name(rpm.name)
+            if parsed and parsed[0].endswith(
+                ('-debuginfo', '-debugsource')
+            ):
+                debug_rpms.append(rpm)
+            else:
+                rpms.append(rpm)
+        await self._import_to(os_dir / arch, rpms)
+        if debug_rpms:
+            await self._import_to(os_dir / arch / 'debug', debug_rpms)
+
+    def _get_repo_dirs(self, repo_base, os_name, os_code_name, arch):
+        os_dir = Path(repo_base) / os_name / os_code_name
+        return (os_dir / 'SRPMS', os_dir / arch, os_dir / arch / 'debug')
+
+    async def _import_to(self, repo_dir, rpms):
+        async with self._lock.setdefault(repo_dir, Lock()):
+            self._import_to_no_lock(repo_dir, rpms)
+
+    def _import_to_no_lock(self, repo_dir, rpms):
+        index = self._get_name_index(repo_dir)
+        for rpm in rpms:
+            parsed = _parse_rpm_name(rpm.name)
+            if not parsed:
+                logger.warning(
+                    f"Ignoring unrecognized RPM file name '{rpm.name}'")
+                continue
+            name = parsed[0]
+            for obsolete in index.pop(name, ()):
+                obsolete.unlink()
+            in_repo = repo_dir / rpm.name
+            in_repo.hardlink_to(rpm)
+            index[name] = [in_repo]
+        _createrepo(repo_dir, '--update')
+        # the index was kept up to date while mutating the repository
+        self._index_mtime[repo_dir] = repo_dir.stat().st_mtime_ns
+
+    def _get_name_index(self, repo_dir):
+        """
+        Get the {package name: [paths]} index of a repository directory.
+
+        The index is cached and only rebuilt when the modification time
+        of the repository directory has changed, so importing N packages
+        does not re-walk the repository N times.
+
+        :param repo_dir: The path to the repository directory
+        :rtype: dict
+        """
+        try:
+            mtime = repo_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._index_mtime.get(repo_dir) != mtime:
+            index = {}
+            for dirpath, _, filenames in os.walk(repo_dir):
+                for filename in filenames:
+                    parsed = _parse_rpm_name(filename)
+                    if parsed:
+                        index.setdefault(parsed[0], []).append(
+                            Path(dirpath) / filename)
+            self._name_index[repo_dir] = index
+            self._index_mtime[repo_dir] = mtime
+        return self._name_index[repo_dir]
@@ -0,0 +1,61 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from colcon_core.dependency_descriptor import DependencyDescriptor
+from colcon_core.package_augmentation \
+    import PackageAugmentationExtensionPoint
+from colcon_core.plugin_system import satisfies_version
+
+
+class RosWorkspacePackageAugmentation(PackageAugmentationExtensionPoint):
+    """Make ROS packages depend on the underlying workspace package."""
+
+    def __init__(self):  # noqa: D107
+        super().__init__()
+        satisfies_version(
+            PackageAugmentationExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+
+    def augment_packages(  # noqa: D102
+        self, descs, *, additional_argument_names=None
+    ):
+        # nothing to do for workspaces without any ros_distro packages
+        if not any(d.type == 'ros_distro' for d in descs):
+            return
+
+        ros_workspace = None
+        for desc in descs:
+            if desc.name == 'ros_workspace':
+                ros_workspace = desc
+                break
+        if ros_workspace is None:
+            return
+
+        # iterate only the descriptors this extension applies to
+        ros_distro_descs = [d for d in descs if d.type == 'ros_distro']
+
+        # packages ros_workspace itself depends on can not also depend
+        # on ros_workspace without creating a cycle; compute the closure
+        # with an iterative traversal over a name index, visiting each
+        # package at most once
+        by_name = {d.name: d for d in descs}
+        stack = list(ros_workspace.get_dependencies(
+            categories=('build', 'run', 'test')))
+        to_exclude = set()
+        while stack:
+            name = stack.pop()
+            if name == 'ros_workspace' or name in to_exclude:
+                continue
+            dep_desc = by_name.get(name)
+            if dep_desc is None:
+                continue
+            to_exclude.add(name)
+            stack.extend(dep_desc.dependencies.get('run', ()))
+
+        # the same immutable descriptors can be shared by all packages
+        build_dep = DependencyDescriptor('ros_workspace')
+        run_dep = DependencyDescriptor('ros_workspace')
+        for desc in ros_distro_descs:
+            if desc.name == 'ros_workspace' or desc.name in to_exclude:
+                continue
+            desc.dependencies['build'].add(build_dep)
+            desc.dependencies['run'].add(run_dep)
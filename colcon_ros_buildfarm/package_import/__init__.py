@@ -0,0 +1,133 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from functools import lru_cache
+import traceback
+
+from colcon_core.logging import colcon_logger
+from colcon_core.plugin_system import get_first_line_doc
+from colcon_core.plugin_system import instantiate_extensions
+from colcon_core.plugin_system import order_extensions_by_name
+
+logger = colcon_logger.getChild(__name__)
+
+
+class PackageImportExtensionPoint:
+    """
+    The interface for package import extensions.
+
+    A package import extension makes built packages available for
+    subsequent builds to depend on.
+
+    For each instance the attribute `PACKAGE_IMPORT_NAME` is being set
+    to the basename of the entry point registering the extension.
+    """
+
+    """The version of the package import extension interface."""
+    EXTENSION_POINT_VERSION = '1.0'
+
+    def add_arguments(self, *, parser):
+        """
+        Add command line arguments specific to the package import.
+
+        The method is intended to be overridden in a subclass.
+
+        :param parser: The argument parser
+        """
+        pass
+
+    async def import_source(self, args, os_name, os_code_name, artifact_path):
+        """
+        Import a built source package.
+
+        The method must be overridden in a subclass.
+
+        :param args: The parsed command line arguments
+        :param os_name: The OS name of the target platform
+        :param os_code_name: The OS code name of the target platform
+        :param artifact_path: The path to the built artifacts
+        """
+        raise NotImplementedError()
+
+    async def import_binary(
+        self, args, os_name, os_code_name, arch, artifact_path
+    ):
+        """
+        Import a built binary package.
+
+        The method must be overridden in a subclass.
+
+        :param args: The parsed command line arguments
+        :param os_name: The OS name of the target platform
+        :param os_code_name: The OS code name of the target platform
+        :param arch: The architecture of the target platform
+        :param artifact_path: The path to the built artifacts
+        """
+        raise NotImplementedError()
+
+
+@lru_cache(maxsize=None)
+def _get_extensions(group_name):
+    extensions = instantiate_extensions(group_name)
+    for name, extension in extensions.items():
+        extension.PACKAGE_IMPORT_NAME = name
+    return order_extensions_by_name(extensions)
+
+
+def get_package_import_extensions(*, group_name=None):
+    """
+    Get the available package import extensions.
+
+    The extensions are ordered by their entry point name.
+    The result is cached so that repeated calls within one invocation do
+    not re-scan the installed entry points.
+
+    :rtype: OrderedDict
+    """
+    if group_name is None:
+        group_name = __name__
+    return _get_extensions(group_name)
+
+
+def add_package_import_arguments(parser, *, extensions=None):
+    """
+    Add the command line arguments for the package import extensions.
+
+    :param parser: The argument parser
+    """
+    if extensions is None:
+        extensions = get_package_import_extensions()
+    keys = list(extensions.keys())
+    descriptions = ''.join(
+        f"\n* {key}: {get_first_line_doc(extension) or '<no description>'}"
+        for key, extension in extensions.items())
+    default = 'local' if 'local' in keys else (keys[0] if keys else None)
+    parser.add_argument(
+        '--package-import',
+        type=str, choices=keys, default=default,
+        help='The package import extension to use (default: '
+             f'{default}){descriptions}')
+    for name, extension in extensions.items():
+        group = parser.add_argument_group(
+            title=f"Arguments for '{name}' package imports")
+        try:
+            retval = extension.add_arguments(parser=group)
+            assert retval is None, 'add_arguments() should return None'
+        except Exception as e:  # noqa: F841
+            # catch exceptions raised in package import extension
+            exc = traceback.format_exc()
+            logger.error(
+                f"Exception in package import extension '{name}': {e}\n{exc}")
+            # skip failing extension, continue with next one
+
+
+def get_package_import_extension(args, *, extensions=None):
+    """
+    Get the package import extension selected by the arguments.
+
+    :param args: The parsed command line arguments
+    :returns: The package import extension
+    """
+    if extensions is None:
+        extensions = get_package_import_extensions()
+    return extensions.get(args.package_import)
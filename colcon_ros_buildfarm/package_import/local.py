@@ -0,0 +1,209 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from functools import lru_cache
+from functools import partial
+from http.server import SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import os
+from pathlib import Path
+from threading import Thread
+
+from colcon_core.logging import colcon_logger
+from colcon_core.plugin_system import satisfies_version
+from colcon_ros_buildfarm._yaml_cache import load_yaml_file
+from colcon_ros_buildfarm.config_augmentation \
+    import ConfigAugmentationExtensionPoint
+from colcon_ros_buildfarm.local_repository \
+    import select_local_repository_extension
+from colcon_ros_buildfarm.package_import import PackageImportExtensionPoint
+import yaml
+
+logger = colcon_logger.getChild(__name__)
+
+# prefer the libyaml C bindings when PyYAML was built with them
+_Dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# a run only ever deals with a handful of OS names, so remember which
+# local repository extension handles each of them
+_select_local_repo = lru_cache(maxsize=None)(
+    select_local_repository_extension)
+
+# OS names whose package managers expand $releasever/$basearch
+_RPM_OS_NAMES = frozenset({'fedora', 'rhel'})
+
+
+def _format_repo_url(url_base, os_name):
+    base = f'{url_base}/{os_name}'
+    if os_name in _RPM_OS_NAMES:
+        return f'{base}/$releasever/$basearch'
+    return base
+
+
+class _SimpleHTTPRequestHandler(SimpleHTTPRequestHandler):
+
+    def copyfile(self, source, outputfile):
+        # serve regular files with zero-copy sendfile instead of reading
+        # them into userspace and writing them back out to the socket
+        try:
+            in_fd = source.fileno()
+            out_fd = outputfile.fileno()
+        except (AttributeError, OSError):
+            return super().copyfile(source, outputfile)
+        offset = 0
+        size = os.fstat(in_fd).st_size
+        while offset < size:
+            sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+            if not sent:
+                break
+            offset += sent
+
+    def log_message(self, format, *args):  # noqa: A002
+        logger.debug(
+            f'{self.address_string()} - {format % args}')
+
+
+class SimpleFileServer:
+    """Serve a local directory over HTTP."""
+
+    def __init__(self, path):  # noqa: D107
+        self._path = path
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Start serving the directory in a background thread.
+
+        The server handles each request in its own thread so concurrent
+        package manager clients are not serialized on a single
+        connection.
+
+        :returns: The (host, port) pair the server is listening on
+        """
+        handler = partial(
+            _SimpleHTTPRequestHandler, directory=str(self._path))
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread = Thread(
+            target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self._server.server_address[:2]
+
+    def stop(self):
+        """Stop serving the directory."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class LocalPackageImportExtension(
+    PackageImportExtensionPoint, ConfigAugmentationExtensionPoint
+):
+    """Import built packages into a local package repository."""
+
+    def __init__(self):  # noqa: D107
+        super().__init__()
+        satisfies_version(
+            PackageImportExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+        satisfies_version(
+            ConfigAugmentationExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+        self._repo_base = None
+        self._server = None
+        self._url_base = None
+
+    def add_arguments(self, *, parser):  # noqa: D102
+        parser.add_argument(
+            '--repo-base',
+            default='repo',
+            help='The base path for all local package repositories '
+                 '(default: repo)')
+
+    def augment_config(  # noqa: D102
+        self, config_path, args, *, index_data=None
+    ):
+        ros_distro = getattr(args, 'ros_distro', None)
+        build_name = getattr(args, 'build_name', None)
+        # without a build file there is nothing to host, so don't bind a
+        # TCP port or initialize any local repositories
+        if ros_distro is None or build_name is None:
+            return
+
+        build_file_path = config_path / \
+            f'{ros_distro}-release-{build_name}.yaml'
+        build_file_data = load_yaml_file(build_file_path)
+        targets = getattr(args, 'target_platform', None)
+        if not targets:
+            assert len(build_file_data['targets']) == 1, \
+                'A build file can only support a single OS'
+            (os_name, os_code_names), = build_file_data['targets'].items()
+            targets = [
+                (os_name, os_code_name, arch)
+                for os_code_name, arches in os_code_names.items()
+                for arch in arches]
+
+        url_base = self._set_up_server(args, targets)
+
+        repositories = build_file_data.setdefault('repositories', {})
+        new_urls = [
+            _format_repo_url(url_base, os_name)
+            for os_name in {target[0] for target in targets}]
+        # prepend the local repositories with a single concatenation
+        # instead of an O(n) shift per insert
+        repositories['keys'] = \
+            [''] * len(new_urls) + repositories.get('keys', [])
+        repositories['urls'] = new_urls + repositories.get('urls', [])
+
+        # serializing to bytes skips the per-write text codec overhead
+        build_file_path.write_bytes(
+            yaml.dump(build_file_data, Dumper=_Dumper, encoding='utf-8'))
+
+    def _get_repo_base(self, args):
+        # args.repo_base is constant for the run, so resolve it once
+        # instead of calling abspath per imported artifact
+        if self._repo_base is None:
+            self._repo_base = Path(os.path.abspath(args.repo_base))
+        return self._repo_base
+
+    async def _dispatch(self, kind, args, os_name, *rest):
+        repo_base = self._get_repo_base(args)
+        extension = _select_local_repo(os_name)
+        if extension is None:
+            logger.warning(
+                'No local package repository extension found to import '
+                '%s package for %r', kind, os_name)
+            return
+        return await getattr(extension, f'import_{kind}')(
+            repo_base, os_name, *rest)
+
+    async def import_source(  # noqa: D102
+        self, args, os_name, os_code_name, artifact_path
+    ):
+        return await self._dispatch(
+            'source', args, os_name, os_code_name, artifact_path)
+
+    async def import_binary(  # noqa: D102
+        self, args, os_name, os_code_name, arch, artifact_path
+    ):
+        return await self._dispatch(
+            'binary', args, os_name, os_code_name, arch, artifact_path)
+
+    def _set_up_server(self, args, targets):
+        repo_base = self._get_repo_base(args)
+        for os_name, os_code_name, arch in targets:
+            extension = _select_local_repo(os_name)
+            if extension is None:
+                logger.warning(
+                    'No local package repository extension found to host '
+                    'packages for %r', os_name)
+                continue
+            extension.initialize(repo_base, os_name, os_code_name, arch)
+        if self._server is None:
+            self._server = SimpleFileServer(repo_base)
+            host, port = self._server.start()
+            self._url_base = f'http://{host}:{port}'
+        return self._url_base
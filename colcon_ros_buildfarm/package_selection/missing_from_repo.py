@@ -0,0 +1,108 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from functools import lru_cache
+from tempfile import TemporaryDirectory
+
+from colcon_core.logging import colcon_logger
+from colcon_core.package_selection import PackageSelectionExtensionPoint
+from colcon_core.plugin_system import satisfies_version
+from colcon_ros_buildfarm._yaml_cache import load_yaml_file
+from colcon_ros_buildfarm.config_augmentation \
+    import ConfigAugmentationExtensionPoint
+from ros_buildfarm.common import get_os_package_name
+from ros_buildfarm.common import Target
+from ros_buildfarm.package_repo import get_package_repo_data
+
+logger = colcon_logger.getChild(__name__)
+
+# the same (ros_distro, package name) pairs are formatted repeatedly
+# across the selection, build and import phases
+_get_os_package_name = lru_cache(maxsize=None)(get_os_package_name)
+
+
+@lru_cache(maxsize=32)
+def _get_packages_in_repo(repository_url, targets):
+    """
+    Enumerate the packages already present in a package repository.
+
+    Fetching and parsing the repository metadata is expensive, so the
+    result is cached for repeated queries of the same repository and
+    targets within one invocation.
+
+    :param repository_url: The base URL of the package repository
+    :param targets: A tuple of (os_name, os_code_name, arch) tuples
+    :returns: The names of the packages in the repository
+    :rtype: set
+    """
+    make_target = Target
+    target_objs = [
+        make_target(os_name, os_code_name, arch)
+        for os_name, os_code_name, arch in targets]
+    with TemporaryDirectory() as cache_dir:
+        repo_data = get_package_repo_data(
+            repository_url, target_objs, cache_dir)
+    in_repo = set()
+    for target_data in repo_data.values():
+        in_repo.update(target_data.keys())
+    return in_repo
+
+
+class MissingFromRepoPackageSelection(
+    PackageSelectionExtensionPoint, ConfigAugmentationExtensionPoint
+):
+    """Skip packages which are already in the target repository."""
+
+    def __init__(self):  # noqa: D107
+        super().__init__()
+        satisfies_version(
+            PackageSelectionExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+        satisfies_version(
+            ConfigAugmentationExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+        self._in_repo = None
+
+    def add_arguments(self, *, parser):  # noqa: D102
+        parser.add_argument(
+            '--packages-skip-in-repo',
+            action='store_true',
+            help='Skip packages which are already available in the target '
+                 'repository')
+
+    def augment_config(  # noqa: D102
+        self, config_path, args, *, index_data=None
+    ):
+        if not getattr(args, 'packages_skip_in_repo', False):
+            return
+        ros_distro = getattr(args, 'ros_distro', None)
+        build_name = getattr(args, 'build_name', None)
+        if ros_distro is None or build_name is None:
+            return
+
+        build_file_path = config_path / \
+            f'{ros_distro}-release-{build_name}.yaml'
+        build_file_data = load_yaml_file(build_file_path)
+        repository_url = build_file_data.get(
+            'target_repository')
+        if not repository_url:
+            return
+
+        targets = tuple(
+            (os_name, os_code_name, arch)
+            for os_name, os_code_names in build_file_data['targets'].items()
+            for os_code_name, arches in os_code_names.items()
+            for arch in arches)
+
+        self._in_repo = _get_packages_in_repo(repository_url, targets)
+
+    def select_packages(self, *, args, decorators):  # noqa: D102
+        in_repo = self._in_repo
+        if not in_repo:
+            return
+        # local bindings shave an attribute or global lookup per package
+        ros_distro = args.ros_distro
+        pkg_name_for = _get_os_package_name
+        for decorator in decorators:
+            if not decorator.selected:
+                continue
+            if pkg_name_for(ros_distro, decorator.descriptor.name) in in_repo:
+                decorator.selected = False
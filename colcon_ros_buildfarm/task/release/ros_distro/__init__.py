@@ -0,0 +1,2 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
@@ -0,0 +1,67 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from hashlib import blake2b
+from pathlib import Path
+import shutil
+import sys
+
+from colcon_core.plugin_system import satisfies_version
+from colcon_core.task import run
+from colcon_core.task import TaskExtensionPoint
+from colcon_ros_buildfarm.package_import \
+    import get_package_import_extension
+
+
+class BuildfarmReleaseBinaryBuildTask(TaskExtensionPoint):
+    """Build a binary package using a ros_buildfarm release job."""
+
+    def __init__(self):  # noqa: D107
+        super().__init__()
+        satisfies_version(TaskExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+
+    async def release(self):  # noqa: D102
+        pkg = self.context.pkg
+        args = self.context.args
+
+        staging_dir = Path(args.build_base) / f'binary-{args.arch}'
+        script_path = staging_dir / 'binary.sh'
+        hash_path = staging_dir / 'binary.sh.hash'
+
+        self.progress('script')
+        gen_res = await run(
+            self.context, [
+                sys.executable, '-m',
+                'ros_buildfarm.scripts.release.generate_release_script',
+                args.config_url, args.ros_distro, args.build_name,
+                pkg.name, args.os_name, args.os_code_name, args.arch,
+                '--skip-source'],
+            capture_output=True)
+        if gen_res.returncode:
+            return gen_res.returncode
+
+        # only tear down and repopulate the staging area when the
+        # generated job script actually changed, so that re-runs skip
+        # straight to executing the job
+        script_hash = blake2b(gen_res.stdout, digest_size=16).hexdigest()
+        try:
+            unchanged = hash_path.read_text() == script_hash
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            if staging_dir.is_dir():
+                shutil.rmtree(staging_dir)
+            staging_dir.mkdir(parents=True)
+            script_path.write_bytes(gen_res.stdout)
+            hash_path.write_text(script_hash)
+
+        self.progress('build')
+        res = await run(
+            self.context, ['sh', str(script_path)], cwd=str(staging_dir))
+        if res.returncode:
+            return res.returncode
+
+        self.progress('import')
+        extension = get_package_import_extension(args)
+        return await extension.import_binary(
+            args, args.os_name, args.os_code_name, args.arch, staging_dir)
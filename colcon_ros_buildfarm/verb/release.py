@@ -0,0 +1,401 @@
+# Copyright 2022 Scott K Logan
+# Licensed under the Apache License, Version 2.0
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import copy
+from graphlib import TopologicalSorter
+import hashlib
+import os
+import os.path
+from pathlib import Path
+import pickle
+import sys
+import time
+
+from colcon_core.argument_parser.destination_collector \
+    import DestinationCollectorDecorator
+from colcon_core.event.job import JobUnselected
+from colcon_core.event_handler import add_event_handler_arguments
+from colcon_core.executor import add_executor_arguments
+from colcon_core.executor import execute_jobs
+from colcon_core.executor import Job
+from colcon_core.executor import OnError
+from colcon_core.package_identification.ignore import IGNORE_MARKER
+from colcon_core.package_selection import add_arguments \
+    as add_packages_arguments
+from colcon_core.package_selection import get_package_descriptors
+from colcon_core.package_selection import get_package_selection_extensions
+from colcon_core.package_selection import select_package_decorators
+from colcon_core.plugin_system import satisfies_version
+from colcon_core.task import add_task_arguments
+from colcon_core.task import get_task_extension
+from colcon_core.task import TaskContext
+from colcon_core.topological_order import topological_order_packages
+from colcon_core.verb import check_and_mark_build_tool
+from colcon_core.verb import logger
+from colcon_core.verb import update_object
+from colcon_core.verb import VerbExtensionPoint
+
+# how long a cached target enumeration stays valid
+_CONFIG_CACHE_TTL = 60 * 60
+
+
+def platform_argument(value):
+    """
+    Parse a target platform argument.
+
+    :param value: A string of the form 'os_name:os_code_name:arch'
+    :rtype: tuple
+    """
+    parts = value.split(':')
+    if len(parts) != 3:
+        raise ValueError(
+            "A target platform must take the form 'os_name:os_code_name:arch'")
+    return tuple(parts)
+
+
+class ReleaseJobArguments:
+    """Arguments to build a release package on a specific platform."""
+
+    def __init__(
+        self, pkg, args, *, additional_destinations=None, cwd=None
+    ):
+        """
+        Construct a ReleaseJobArguments.
+
+        The instance is a per-package prototype: the platform attributes
+        `os_name`, `os_code_name` and `arch` are initialized to None and
+        are filled in on a copy created by `for_platform` for each
+        scheduled job, so the path resolution and additional argument
+        merging only happen once per package.
+
+        :param pkg: The package descriptor
+        :param args: The parsed command line arguments
+        :param list additional_destinations: The destinations of additional
+          arguments
+        :param cwd: The current working directory, if already known
+        """
+        super().__init__()
+        if cwd is None:
+            cwd = os.getcwd()
+        self.build_base = os.path.abspath(os.path.join(
+            cwd, args.build_base, pkg.name))
+        # these strings are duplicated across every job, so intern them
+        # to share a single object and make comparisons pointer checks
+        self.config_url = sys.intern(args.config_url)
+        self.ros_distro = sys.intern(args.ros_distro)
+        self.build_name = sys.intern(args.build_name)
+        self.os_name = None
+        self.os_code_name = None
+        self.arch = None
+
+        # set additional arguments
+        for dest in (additional_destinations or []):
+            # from the command line
+            if hasattr(args, dest):
+                update_object(
+                    self, dest, getattr(args, dest),
+                    pkg.name, 'release', 'command line')
+            # from the package metadata
+            if dest in pkg.metadata:
+                update_object(
+                    self, dest, pkg.metadata[dest],
+                    pkg.name, 'release', 'package metadata')
+
+    def for_platform(self, os_name, os_code_name, arch=None):
+        """
+        Create a copy of the arguments for a specific target platform.
+
+        :param os_name: The OS name of the target platform
+        :param os_code_name: The OS code name of the target platform
+        :param arch: The architecture of the target platform, if any
+        :rtype: ReleaseJobArguments
+        """
+        clone = copy.copy(self)
+        clone.os_name = sys.intern(os_name)
+        clone.os_code_name = sys.intern(os_code_name)
+        clone.arch = sys.intern(arch) if arch is not None else None
+        return clone
+
+
+class RosBuildfarmReleaseVerb(VerbExtensionPoint):
+    """Build release packages using ros_buildfarm jobs."""
+
+    def __init__(self):  # noqa: D107
+        super().__init__()
+        satisfies_version(VerbExtensionPoint.EXTENSION_POINT_VERSION, '^1.0')
+
+    def add_arguments(self, *, parser):  # noqa: D102
+        # imported here so that merely enumerating the verbs does not pay
+        # for loading ros_buildfarm and the extension modules
+        from colcon_ros_buildfarm.config_augmentation \
+            import add_config_augmentation_arguments
+        from colcon_ros_buildfarm.package_import \
+            import add_package_import_arguments
+        parser.add_argument(
+            'ros_distro',
+            help='The name of the ROS distro to build packages for')
+        parser.add_argument(
+            '--build-name',
+            default='default',
+            help="The name of the 'release-build' file from the index "
+                 '(default: default)')
+        parser.add_argument(
+            '--upstream-config-url',
+            default='https://raw.githubusercontent.com/ros-infrastructure'
+                    '/ros_buildfarm_config/production/index.yaml',
+            help='The URL of the upstream ROS buildfarm configuration index')
+        parser.add_argument(
+            '--build-base',
+            default='build',
+            help='The base path for all build directories (default: build)')
+        parser.add_argument(
+            '--target-platform',
+            nargs='*', type=platform_argument,
+            help='The platforms to build packages for, given as '
+                 "'os_name:os_code_name:arch' "
+                 '(default: all platforms in the build file)')
+        parser.add_argument(
+            '--no-config-cache',
+            action='store_true',
+            help='Enumerate the target platforms from the configuration '
+                 'even when a cached enumeration is still valid')
+        parser.add_argument(
+            '--continue-on-error',
+            action='store_true',
+            help='Continue other packages when a package fails to build '
+                 '(packages recursively depending on the failed package are '
+                 'skipped)')
+        add_executor_arguments(parser)
+        add_event_handler_arguments(parser)
+
+        add_packages_arguments(parser)
+
+        decorated_parser = DestinationCollectorDecorator(parser)
+        add_task_arguments(
+            decorated_parser, 'colcon_ros_buildfarm.task.release')
+        add_package_import_arguments(decorated_parser)
+        add_config_augmentation_arguments(decorated_parser)
+        self.task_argument_destinations = decorated_parser.get_destinations()
+
+    def main(self, *, context):  # noqa: D102
+        from colcon_ros_buildfarm.config_augmentation import get_config
+        args = context.args
+        check_and_mark_build_tool(args.build_base)
+        self._create_path(args.build_base)
+
+        # instantiate the selection extensions before spawning the
+        # worker thread because the plugin instance cache is not thread
+        # safe and the same instances may also be registered as config
+        # augmentation extensions
+        selection_extensions = get_package_selection_extensions()
+
+        # discovering and augmenting the workspace packages is purely
+        # local work, so overlap it with the network-bound configuration
+        # fetches; the packages are only selected after the fetches have
+        # finished because selection extensions may depend on state
+        # collected while augmenting the configuration
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            descriptors_future = executor.submit(
+                get_package_descriptors, args,
+                additional_argument_names=self.task_argument_destinations,
+                selection_extensions=selection_extensions)
+
+            args.config_url = get_config(
+                args, os.path.join(args.build_base, '_buildfarm_config'))
+
+            if not args.target_platform:
+                args.target_platform = self._get_targets(args)
+
+            descriptors = descriptors_future.result()
+
+        decorators = topological_order_packages(
+            descriptors, recursive_categories=('run', ))
+        select_package_decorators(
+            args, decorators, selection_extensions=selection_extensions)
+
+        # check for duplicate package names
+        pkg_names = [d.descriptor.name for d in decorators if d.selected]
+        if len(set(pkg_names)) < len(pkg_names):
+            duplicates = sorted(
+                name for name in set(pkg_names)
+                if pkg_names.count(name) > 1)
+            raise RuntimeError(
+                'Duplicate package names not supported: ' +
+                ', '.join(duplicates))
+
+        jobs, unselected_packages = self._get_jobs(args, decorators)
+
+        on_error = OnError.interrupt \
+            if not args.continue_on_error else OnError.skip_downstream
+
+        def post_unselected_packages(*, event_queue):
+            names = [pkg.name for pkg in unselected_packages]
+            for name in sorted(names):
+                event_queue.put(
+                    (JobUnselected(name), None))
+
+        return execute_jobs(
+            context, jobs, on_error=on_error,
+            pre_execution_callback=post_unselected_packages)
+
+    def _create_path(self, path):
+        path = os.path.abspath(path)
+        os.makedirs(path, exist_ok=True)
+        # O_EXCL creates the marker and checks for its existence in a
+        # single system call instead of a stat followed by an open
+        marker = os.path.join(path, IGNORE_MARKER)
+        try:
+            fd = os.open(marker, os.O_CREAT | os.O_WRONLY | os.O_EXCL, 0o644)
+        except FileExistsError:
+            pass
+        else:
+            os.close(fd)
+
+    def _get_targets(self, args):
+        """
+        Enumerate the target platforms of the release build file.
+
+        The enumeration is cached on disk keyed on the upstream
+        configuration, the ROS distro and the build name, so warm
+        re-runs within the validity window skip fetching and parsing
+        the configuration index again.
+
+        :param args: The parsed command line arguments
+        :returns: A list of (os_name, os_code_name, arch) tuples
+        """
+        from ros_buildfarm.config import get_index
+        from ros_buildfarm.config import get_release_build_files
+        cache_key = hashlib.sha256(':'.join((
+            args.upstream_config_url, args.ros_distro, args.build_name,
+        )).encode()).hexdigest()
+        cache_dir = \
+            Path(args.build_base) / '_buildfarm_config' / 'index_cache'
+        cache_path = cache_dir / f'{cache_key}.pickle'
+        if not args.no_config_cache:
+            try:
+                if time.time() - cache_path.stat().st_mtime < \
+                        _CONFIG_CACHE_TTL:
+                    with cache_path.open('rb') as f:
+                        return pickle.load(f)
+            except OSError:
+                pass
+
+        index = get_index(args.config_url)
+        build_files = get_release_build_files(index, args.ros_distro)
+        build_file = build_files[args.build_name]
+        targets = [
+            (os_name, os_code_name, arch)
+            for os_name, os_code_names in build_file.targets.items()
+            for os_code_name, arches in os_code_names.items()
+            for arch in arches]
+
+        if not args.no_config_cache:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            # write atomically so a concurrent reader never sees a
+            # partial pickle
+            tmp_path = cache_path.with_suffix('.tmp')
+            with tmp_path.open('wb') as f:
+                pickle.dump(targets, f)
+            tmp_path.replace(cache_path)
+        return targets
+
+    def _get_jobs(self, args, decorators):
+        # execute_jobs consumes the jobs with popitem(last=False), so
+        # the mapping must be an OrderedDict rather than a plain dict
+        jobs = OrderedDict()
+        unselected_packages = set()
+        ros_distro = sys.intern(args.ros_distro)
+
+        # values which are identical for every job, computed once
+        additional_destinations = tuple(
+            self.task_argument_destinations.values())
+        src_prefix = f'{ros_distro[0].upper()}src'
+        bin_prefix = f'{ros_distro[0].upper()}bin'
+        if args.build_name != 'default':
+            src_prefix += f'_{args.build_name}'
+            bin_prefix += f'_{args.build_name}'
+        task_extensions = {}
+        cwd = os.getcwd()
+        target_platforms = args.target_platform
+        # the target OSes for source builds are the same for every
+        # package, so derive them from the platform list only once
+        source_platforms = sorted(
+            frozenset(plat[:2] for plat in target_platforms))
+
+        for decorator in decorators:
+            pkg = decorator.descriptor
+
+            if not decorator.selected:
+                unselected_packages.add(pkg)
+                continue
+
+            extensions = task_extensions.get(pkg.type)
+            if extensions is None:
+                extensions = (
+                    get_task_extension(
+                        'colcon_ros_buildfarm.task.release',
+                        f'{pkg.type}.source'),
+                    get_task_extension(
+                        'colcon_ros_buildfarm.task.release',
+                        f'{pkg.type}.binary'))
+                task_extensions[pkg.type] = extensions
+            source_extension, binary_extension = extensions
+            if not source_extension or not binary_extension:
+                logger.warning(
+                    f"No task extensions to 'release' a '{pkg.type}' package")
+                continue
+
+            recursive_dependencies = list(decorator.recursive_dependencies)
+            prototype = ReleaseJobArguments(
+                pkg, args,
+                additional_destinations=additional_destinations, cwd=cwd)
+
+            # one source package build per target OS
+            for os_name, os_code_name in source_platforms:
+                job_args = prototype.for_platform(os_name, os_code_name)
+                src_id = sys.intern(
+                    f'{src_prefix}__{pkg.name}__{os_name}_{os_code_name}')
+                task_context = TaskContext(
+                    pkg=pkg, args=job_args, dependencies={})
+                jobs[src_id] = Job(
+                    identifier=src_id,
+                    dependencies=set(),
+                    task=source_extension, task_context=task_context)
+
+            # one binary package build per target platform
+            for os_name, os_code_name, arch in target_platforms:
+                job_args = prototype.for_platform(
+                    os_name, os_code_name, arch)
+                src_id = sys.intern(
+                    f'{src_prefix}__{pkg.name}__{os_name}_{os_code_name}')
+                # format the shared identifier parts once per platform so
+                # each dependency only pays for two concatenations
+                bin_prefix_full = bin_prefix + '__'
+                bin_suffix = f'__{os_name}_{os_code_name}_{arch}'
+                dependency_identifiers = {
+                    src_id,
+                    *(sys.intern(bin_prefix_full + dep + bin_suffix)
+                      for dep in recursive_dependencies)}
+                task_context = TaskContext(
+                    pkg=pkg, args=job_args, dependencies={})
+                job = Job(
+                    identifier=sys.intern(
+                        bin_prefix_full + pkg.name + bin_suffix),
+                    dependencies=dependency_identifiers,
+                    task=binary_extension, task_context=task_context)
+                if job.identifier not in jobs:
+                    jobs[job.identifier] = job
+
+        # validate the job graph up front so dependency cycles fail
+        # before any job is executed, and normalize the scheduling order
+        # to a topological one
+        sorter = TopologicalSorter()
+        for identifier, job in jobs.items():
+            sorter.add(identifier, *job.dependencies)
+        jobs = OrderedDict(
+            (identifier, jobs[identifier])
+            for identifier in sorter.static_order()
+            if identifier in jobs)
+        return jobs, unselected_packages